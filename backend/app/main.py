@@ -1,25 +1,193 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from pinecone import Pinecone
+from typing import List, Optional, Callable, Awaitable
+from pinecone.grpc import PineconeGRPC as Pinecone
 import os
 from sentence_transformers import SentenceTransformer
+from transformers import AutoTokenizer
+import onnxruntime as ort
+import torch
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
+import random
+import time
 import re
 import json
+import hashlib
 import pandas as pd
-import ast
-from collections import Counter
+import numpy as np
+from cachetools import LRUCache, TTLCache
+from collections import deque
+from groq import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+import redis.asyncio as aioredis
+from redisvl.extensions.llmcache import SemanticCache
+from redisvl.utils.vectorize import CustomTextVectorizer
 
 load_dotenv()
 ml_models = {}
 
+# Index vectors are [384-d MiniLM text | 768-d image] (see Training/generate_embeddings.ipynb).
+# Queries are text-only, so the image half is zero-padded.
+TEXT_EMBEDDING_DIM = 384
+IMAGE_EMBEDDING_DIM = 768
+ZERO_QUERY_VECTOR = [0.0] * (TEXT_EMBEDDING_DIM + IMAGE_EMBEDDING_DIM)  # shared, never mutated
+# Reused for every query: only the text slice is ever written, the image tail stays zero.
+# Safe because build_query_vector runs on the event loop thread and never awaits.
+_QUERY_BUFFER = np.zeros(TEXT_EMBEDDING_DIM + IMAGE_EMBEDDING_DIM, dtype=np.float32)
+# The index metric is cosine, so encode with unit-norm output; batch multi-text encodes
+ENCODE_BATCH_SIZE = 32
+
+def build_query_vector(text_embedding: np.ndarray) -> List[float]:
+    """Pad a text embedding to the index dimension (Pinecone's client wants a list)"""
+    _QUERY_BUFFER[:TEXT_EMBEDDING_DIM] = text_embedding
+    return _QUERY_BUFFER.tolist()
+
+# Use category keywords for better embedding than the raw query
+CATEGORY_SEARCH_TEXT = {
+    "sofa": "sofa couch sectional living room seating",
+    "bed": "bed frame bedroom sleeping",
+    "chair": "chair seating dining office",
+    "table": "table desk surface",
+    "ottoman": "ottoman footstool",
+    "storage": "dresser nightstand storage cabinet"
+}
+
+# Example messages per intent; a query close enough to one of them skips the LLM
+INTENT_EXAMPLES = {
+    "GREETING": ["hi", "hello", "hey there", "good morning"],
+    "FOLLOW_UP": ["under $50", "cheaper ones", "red ones", "in blue", "smaller ones",
+                  "only the wooden ones", "show me the leather ones", "from FANYE"],
+    "QUESTION": ["which is cheapest", "what's the difference", "tell me more about the first one",
+                 "what is the second one made of", "which one is the biggest", "how big is it"],
+    "SEARCH": ["find sofa", "show me beds", "sofas", "I'm looking for a dining table",
+               "red leather couch", "wooden dining table under $200", "I need an office chair"],
+}
+# Below this cosine similarity (or margin over the runner-up) the LLM decides instead
+INTENT_MIN_SIMILARITY = 0.5
+INTENT_MIN_MARGIN = 0.05
+
+# Precompiled regex patterns used on every request / analytics row
+PRICE_RE = re.compile(r'\d+\.?\d*')
+PRICE_MAX_RE = re.compile(r'(?:under|below|less than|<)\s*\$?\s*(\d+)')
+PRICE_SUFFIX_RE = re.compile(r'\$?\s*(\d+)\s*\$')  # "130$" format
+DIGITS_RE = re.compile(r'\d+')
+# Capitalised words after the first one, e.g. the brand in "sofas from FANYE"
+BRAND_TOKEN_RE = re.compile(r'(?<=\s)[A-Z][A-Za-z0-9&-]+')
+_STRIP_CURRENCY = str.maketrans('', '', '$,')
+
+# (pattern, priority) - lower priority features are listed first in summaries
+FEATURE_PATTERNS = [
+    (re.compile(r'(\d+\s*(?:drawer|shelf|shelves|tier|piece|seater|seat)s?)', re.IGNORECASE), 1),
+    (re.compile(r'(adjustable|foldable|convertible|extendable|reclining)', re.IGNORECASE), 1),
+    (re.compile(r'(storage|space-saving)', re.IGNORECASE), 1),
+    (re.compile(r'(ergonomic|lumbar support)', re.IGNORECASE), 1),
+    (re.compile(r'(upholstered|cushioned|padded)', re.IGNORECASE), 1),
+    (re.compile(r'(leather|velvet|linen|wood|metal)', re.IGNORECASE), 2),
+    (re.compile(r'(modular|sectional)', re.IGNORECASE), 1),
+]
+
+# L2 semantic cache: near-duplicate queries reuse earlier LLM answers.
+# Q&A is left out on purpose - its answer depends on the displayed products.
+SEMANTIC_CACHE_CHAINS = ["combined_chain", "intent_chain", "query_chain", "followup_chain"]
+SEMANTIC_CACHE_MIN_SIMILARITY = 0.93
+SEMANTIC_CACHE_TTL = 86400
+
+def load_semantic_caches(text_model) -> dict:
+    """Create one Redis semantic cache per chain, if REDIS_URL is configured"""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        print("ℹ️ REDIS_URL not set, semantic cache disabled")
+        return {}
+    
+    try:
+        # Reuse the MiniLM model we already load instead of a second embedder
+        vectorizer = CustomTextVectorizer(embed=lambda text: text_model.encode(text).tolist())
+        return {
+            chain_name: SemanticCache(
+                name=f"llmcache_{chain_name}",
+                redis_url=redis_url,
+                distance_threshold=1 - SEMANTIC_CACHE_MIN_SIMILARITY,
+                ttl=SEMANTIC_CACHE_TTL,
+                vectorizer=vectorizer
+            )
+            for chain_name in SEMANTIC_CACHE_CHAINS
+        }
+    except Exception as e:
+        print(f"⚠️ Semantic cache unavailable: {e}")
+        return {}
+
+TEXT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# int8 ONNX export of MiniLM, built with the optimum-cli steps in the README
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "minilm_int8/model_quantized.onnx")
+# CPU threads for one encode call; queries are single short strings, so use every core
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", os.cpu_count() or 1))
+
+class OnnxSentenceEncoder:
+    """Drop-in for SentenceTransformer.encode() backed by an int8 ONNX MiniLM"""
+    
+    def __init__(self, model_path: str, tokenizer_name: str, max_seq_length: int = 256):
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ENCODER_THREADS
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = max_seq_length
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feed = {name: value.astype(np.int64) for name, value in tokens.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+        
+        # Mean pooling over real tokens, then L2 norm - same as the
+        # Pooling + Normalize modules of all-MiniLM-L6-v2
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        # MiniLM output is always unit-norm, so normalize_embeddings and
+        # convert_to_numpy are accepted for API parity and need no extra work
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.vstack([
+            self._encode_batch(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]).astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+def load_text_model():
+    """Use the quantized ONNX encoder when it has been built, else PyTorch MiniLM"""
+    if os.path.exists(ONNX_MODEL_PATH):
+        print(f"⚡ Using int8 ONNX text encoder: {ONNX_MODEL_PATH}")
+        return OnnxSentenceEncoder(ONNX_MODEL_PATH, TEXT_MODEL_NAME)
+    torch.set_num_threads(ENCODER_THREADS)
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+# Output budget per chain, bound onto the one shared ChatGroq client
+CHAIN_MAX_TOKENS = {
+    "intent_chain": 10,  # one word
+    "title_classifier_chain": 200,  # JSON list, one word per candidate
+    "query_chain": 100,
+    "combined_chain": 120,
+    "qa_chain": 300,
+    "followup_chain": 100
+}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load models on startup"""
@@ -33,32 +201,57 @@ async def lifespan(app: FastAPI):
         model="llama-3.1-8b-instant", 
         groq_api_key=groq_api_key, 
         temperature=0,
-        max_tokens=500
+        max_tokens=500,  # ceiling; each chain binds a tighter CHAIN_MAX_TOKENS
+        max_retries=0  # retries are handled by call_groq
     )
     
-    ml_models["text_model"] = SentenceTransformer('all-MiniLM-L6-v2')
+    ml_models["text_model"] = load_text_model()
     ml_models["llm"] = llm
     
+    # Category search strings are fixed, so embed them once (as one batch)
+    category_embeddings = ml_models["text_model"].encode(
+        list(CATEGORY_SEARCH_TEXT.values()),
+        batch_size=ENCODE_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+    ml_models["category_query_vectors"] = {
+        category: build_query_vector(embedding)
+        for category, embedding in zip(CATEGORY_SEARCH_TEXT, category_embeddings)
+    }
+    
+    # Intent prototypes for the embedding classifier
+    intent_texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+    ml_models["intent_prototypes"] = ml_models["text_model"].encode(
+        intent_texts,
+        batch_size=ENCODE_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+    ml_models["intent_labels"] = np.array([
+        intent for intent, examples in INTENT_EXAMPLES.items() for _ in examples
+    ])
+    
+    # Every template keeps its fixed instructions first and the per-request
+    # fields last, so provider-side prefix caching can reuse the shared prefix
+    
     # Intent detection
-    intent_template = """Classify user intent. Return ONLY ONE WORD.
-
-GREETING: "hi", "hello", "hey"
-FOLLOW_UP: Filtering previous results ("under $50", "red ones", "cheaper ones")
-QUESTION: Asking about shown products ("which is cheapest", "what's the difference")
-SEARCH: Looking for products ("find sofa", "show me beds", "sofas")
-
-History: {history}
-Query: "{query}"
+    intent_system = """Classify user intent. Reply with ONE word: GREETING, FOLLOW_UP, QUESTION or SEARCH.
 
-Return ONLY one word (GREETING/FOLLOW_UP/QUESTION/SEARCH):"""
+GREETING | ("hi", "hello")
+FOLLOW_UP | filters shown results ("under $50", "red ones", "cheaper ones")
+QUESTION | asks about shown products ("which is cheapest", "what's the difference")
+SEARCH | looks for products ("find sofa", "show me beds", "sofas")"""
     
-    intent_prompt = ChatPromptTemplate.from_template(intent_template)
-    ml_models["intent_chain"] = intent_prompt | llm | StrOutputParser()
+    intent_prompt = ChatPromptTemplate.from_messages([
+        ("system", intent_system),
+        ("human", 'History: {history}\nQuery: "{query}"\nIntent:')
+    ])
+    ml_models["intent_chain"] = intent_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["intent_chain"]) | StrOutputParser()
     
-    # Title classifier - determines PRIMARY product category
-    title_classifier_template = """What is the PRIMARY product category of this furniture item?
-
-Product Title: "{title}"
+    # Title classifier - determines PRIMARY product category for a whole batch of titles
+    # (bump TITLE_CLASSIFIER_VERSION when changing this prompt)
+    title_classifier_template = """What is the PRIMARY product category of each furniture item below?
 
 Look at the MAIN product being sold, not accessories or features mentioned.
 
@@ -79,16 +272,17 @@ Examples:
 "Ottoman Storage Bench" → ottoman
 "Sofa Side Table" → table (it's a table that goes beside sofas)
 
-Return ONLY the category word (sofa/chair/bed/table/ottoman/storage/other):"""
+Product Titles (JSON list):
+{titles}
+
+Return ONLY a JSON list with one category word per title, in the same order (e.g. ["sofa", "chair", "table"]):"""
     
     title_classifier_prompt = ChatPromptTemplate.from_template(title_classifier_template)
-    ml_models["title_classifier_chain"] = title_classifier_prompt | llm | StrOutputParser()
+    ml_models["title_classifier_chain"] = title_classifier_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["title_classifier_chain"]) | StrOutputParser()
     
     # Query parser - this is the ONLY job for LLM
     query_template = """Extract what furniture the user wants.
 
-Query: "{query}"
-
 Identify the MAIN furniture category:
 - sofa/couch/sectional/loveseat → "sofa"
 - bed/bedframe → "bed"  
@@ -115,32 +309,75 @@ Examples:
 "sports equipment" → {{"category": "sports"}}
 "beds" → {{"category": "bed"}}
 
+Query: "{query}"
+
 JSON:"""
     
     query_prompt = ChatPromptTemplate.from_template(query_template)
-    ml_models["query_chain"] = query_prompt | llm | StrOutputParser()
+    ml_models["query_chain"] = query_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["query_chain"]) | StrOutputParser()
+    
+    # Intent detection + query parsing in one call (the separate chains above are the fallback)
+    combined_system = """Classify user intent. If the user is looking for products, also extract what furniture they want.
+
+GREETING: "hi", "hello", "hey"
+FOLLOW_UP: Filtering previous results ("under $50", "red ones", "cheaper ones")
+QUESTION: Asking about shown products ("which is cheapest", "what's the difference")
+SEARCH: Looking for products ("find sofa", "show me beds", "sofas")
+
+For SEARCH, identify the MAIN furniture category:
+- sofa/couch/sectional/loveseat → "sofa"
+- bed/bedframe → "bed"
+- chair/armchair/recliner → "chair"
+- table/desk → "table"
+- ottoman/footstool → "ottoman"
+- dresser/nightstand → "storage"
+- sports/exercise/gym/fitness → "sports" (NOT furniture)
+- appliance/electronic/gadget → "electronics" (NOT furniture)
+
+and return JSON on the line after the intent:
+{{
+  "category": "sofa|bed|chair|table|ottoman|storage|sports|electronics|other",
+  "material": "wood|metal|fabric|leather|null",
+  "color": "red|blue|gray|etc|null",
+  "size": "large|small|null",
+  "price_max": number or null
+}}
+
+Examples:
+"hello" → GREETING
+"cheaper ones" → FOLLOW_UP
+"which one is the biggest" → QUESTION
+"find sofas" → SEARCH
+{{"category": "sofa"}}
+"wooden dining table under $200" → SEARCH
+{{"category": "table", "material": "wood", "price_max": 200}}
+
+Return the intent word (GREETING/FOLLOW_UP/QUESTION/SEARCH) on the first line, then the JSON only for SEARCH."""
+    
+    combined_prompt = ChatPromptTemplate.from_messages([
+        ("system", combined_system),
+        ("human", 'History: {history}\nQuery: "{query}"')
+    ])
+    ml_models["combined_chain"] = combined_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["combined_chain"]) | StrOutputParser()
     
     # Q&A for product comparisons and questions
     qa_template = """You are helping a customer compare furniture products.
 
+Provide a helpful, concise answer (2-3 sentences max). If comparing products, be specific about which product you're referring to (e.g., "The first one...", "Product #2...").
+
 DISPLAYED PRODUCTS:
 {products}
 
 CUSTOMER QUESTION: "{query}"
 
-Provide a helpful, concise answer (2-3 sentences max). If comparing products, be specific about which product you're referring to (e.g., "The first one...", "Product #2...").
-
 Answer:"""
     
     qa_prompt = ChatPromptTemplate.from_template(qa_template)
-    ml_models["qa_chain"] = qa_prompt | llm | StrOutputParser()
+    ml_models["qa_chain"] = qa_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["qa_chain"]) | StrOutputParser()
     
     # Follow-up filter parser
     followup_template = """Extract filters from user request. Return ONLY valid JSON.
 
-PREVIOUS PRODUCTS: {product_list}
-USER REQUEST: "{query}"
-
 Extract filters:
 - price_max: number or null (e.g., "under 130" → 130)
 - color: specific color or null
@@ -156,13 +393,36 @@ Examples:
 "large sofas" → {{"size": "large"}}
 "from FANYE" → {{"brand": "FANYE"}}
 
+PREVIOUS PRODUCTS: {product_list}
+USER REQUEST: "{query}"
+
 Return ONLY valid JSON (no explanations):"""
     
     followup_prompt = ChatPromptTemplate.from_template(followup_template)
-    ml_models["followup_chain"] = followup_prompt | llm | StrOutputParser()
+    ml_models["followup_chain"] = followup_prompt | llm.bind(max_tokens=CHAIN_MAX_TOKENS["followup_chain"]) | StrOutputParser()
+    
+    # Template sizes for the Groq token estimate (the prompt is the first step of each chain)
+    ml_models["chain_prompt_chars"] = {
+        name: sum(len(message.prompt.template) for message in ml_models[name].first.messages)
+        for name in CHAIN_MAX_TOKENS
+    }
+    
+    redis_url = os.getenv("REDIS_URL")
+    ml_models["redis"] = aioredis.from_url(redis_url, decode_responses=True) if redis_url else None
+    ml_models["semantic_caches"] = load_semantic_caches(ml_models["text_model"])
+    
+    # Open the Pinecone channel now so the first user request doesn't pay for the handshake
+    try:
+        await asyncio.to_thread(index.query, vector=ZERO_QUERY_VECTOR, top_k=1)
+    except Exception as e:
+        print(f"⚠️ Pinecone warm-up failed: {e}")
     
     print("✅ Models loaded")
+    analytics_task = asyncio.create_task(refresh_analytics_forever())
     yield
+    analytics_task.cancel()
+    if ml_models["redis"] is not None:
+        await ml_models["redis"].aclose()
     ml_models.clear()
 
 app = FastAPI(lifespan=lifespan)
@@ -185,7 +445,7 @@ class Product(BaseModel):
     title: str
     image: Optional[str] = None
     price: Optional[str] = None
-    key_features: Optional[List[str]] = None
+    key_features: Optional[list[str]] = None
     best_for: Optional[str] = None
     dimensions: Optional[str] = None
     material: Optional[str] = None
@@ -194,41 +454,313 @@ class Product(BaseModel):
 
 class ConversationalQuery(BaseModel):
     query: str
-    history: List[ChatMessage]
-    last_products: Optional[List[Product]] = None
+    history: list[ChatMessage]
+    last_products: Optional[list[Product]] = None
 
+# The gRPC index reuses one HTTP/2 channel for every query instead of a request per call
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index(os.getenv("INDEX_NAME"))
 
-def classify_product_title(title: str) -> str:
-    """Use LLM to classify product's PRIMARY category"""
-    try:
-        result = ml_models["title_classifier_chain"].invoke({"title": title})
-        category = result.strip().lower()
-        
-        # Validate it's a known category
-        valid_categories = ["sofa", "chair", "bed", "table", "ottoman", "storage", "sports", "other"]
-        if category in valid_categories:
-            return category
+# Groq plan limits: in-flight requests and tokens per minute (free tier defaults)
+GROQ_MAX_CONCURRENCY = 8
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+GROQ_MAX_RETRIES = 3
+# Longest retry-after we'll wait out inside a single request
+GROQ_MAX_RETRY_AFTER = 60
+# Transient failures worth another attempt (the client itself runs with max_retries=0)
+GROQ_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def estimate_groq_tokens(chain_name: str, payload: dict) -> int:
+    """Prompt template + payload (~4 chars per token) plus the chain's full output budget"""
+    prompt_chars = ml_models["chain_prompt_chars"][chain_name] + sum(len(str(v)) for v in payload.values())
+    return prompt_chars // 4 + CHAIN_MAX_TOKENS[chain_name]
+
+def groq_retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying: Groq's retry-after on 429s, else exponential backoff"""
+    if isinstance(error, RateLimitError):
+        try:
+            return min(float(error.response.headers["retry-after"]), GROQ_MAX_RETRY_AFTER)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return 2 ** attempt * 0.5 + random.random() * 0.1
+
+class TokenRateLimiter:
+    """Sliding one-minute window over estimated tokens sent to Groq"""
+    
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()  # (timestamp, tokens)
+        self.used = 0
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= 60:
+                    self.used -= self.window.popleft()[1]
+                # Always let a call through on an empty window, even an oversized one
+                if not self.window or self.used + tokens <= self.tokens_per_minute:
+                    break
+                await asyncio.sleep(60 - (now - self.window[0][0]))
+            self.window.append((now, tokens))
+            self.used += tokens
+
+groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+groq_token_limiter = TokenRateLimiter(GROQ_TOKENS_PER_MINUTE)
+
+async def call_groq(chain_name: str, payload: dict) -> str:
+    """Invoke an LLM chain within Groq's rate limits, retrying 429s and transient errors"""
+    estimated_tokens = estimate_groq_tokens(chain_name, payload)
+    
+    async with groq_semaphore:
+        await groq_token_limiter.acquire(estimated_tokens)
+        for attempt in range(GROQ_MAX_RETRIES):
+            try:
+                return await ml_models[chain_name].ainvoke(payload)
+            except GROQ_RETRYABLE_ERRORS as e:
+                if attempt == GROQ_MAX_RETRIES - 1:
+                    raise
+                delay = groq_retry_delay(e, attempt)
+                print(f"⏳ Groq {type(e).__name__} on {chain_name}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+async def stream_groq(chain_name: str, payload: dict, on_delta: Callable[[str], Awaitable[None]]) -> str:
+    """Like call_groq, but passes each text chunk to on_delta as it arrives"""
+    estimated_tokens = estimate_groq_tokens(chain_name, payload)
+    
+    async with groq_semaphore:
+        await groq_token_limiter.acquire(estimated_tokens)
+        for attempt in range(GROQ_MAX_RETRIES):
+            chunks = []
+            try:
+                async for chunk in ml_models[chain_name].astream(payload):
+                    if chunk:
+                        chunks.append(chunk)
+                        await on_delta(chunk)
+                return "".join(chunks)
+            except GROQ_RETRYABLE_ERRORS as e:
+                # Text already sent can't be taken back, so only retry before the first chunk
+                if chunks or attempt == GROQ_MAX_RETRIES - 1:
+                    raise
+                delay = groq_retry_delay(e, attempt)
+                print(f"⏳ Groq {type(e).__name__} on {chain_name}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+VALID_CATEGORIES = ["sofa", "chair", "bed", "table", "ottoman", "storage", "sports", "other"]
+
+# Keyword groups per category, in priority order for the fallback
+CATEGORY_KEYWORDS = [
+    ("sofa", re.compile(r'\b(?:sofa|couch|sectional|loveseat)(?:e?s)?\b')),
+    ("chair", re.compile(r'\b(?:chair|armchair|recliner)s?\b')),
+    ("bed", re.compile(r'\b(?:bed|bedframe)s?\b')),
+    ("table", re.compile(r'\b(?:table|desk)s?\b')),
+    ("ottoman", re.compile(r'\b(?:ottoman|footstool)s?\b')),
+    ("storage", re.compile(r'\b(?:dresser|cabinet|nightstand)s?\b')),
+]
+# "Sofa Cover", "Bed Risers", "Desk Organizer" name a category without being one - leave
+# those to the LLM. A hit only costs an LLM call ("Recliner with Cup Holders" still
+# comes back as a chair), so err on the side of listing more accessory nouns.
+ACCESSORY_RE = re.compile(
+    r'\b(?:cover|slipcover|cushion|pillow|pad|lamp|sheet|skirt|topper|protector|rug|mat'
+    r'|riser|rail|organizer|holder|tray|hook)s?\b'
+    r'|\bcadd(?:y|ies)\b'
+)
+
+def keyword_matches(title_lower: str) -> List[str]:
+    """Every category whose keywords appear in the title"""
+    return [category for category, pattern in CATEGORY_KEYWORDS if pattern.search(title_lower)]
+
+def fast_keyword_classify(title_lower: str) -> Optional[str]:
+    """Category for unambiguous titles, None when the LLM should decide"""
+    if ACCESSORY_RE.search(title_lower):
+        return None
+    matches = keyword_matches(title_lower)
+    return matches[0] if len(matches) == 1 else None
+
+def keyword_classify(title: str) -> str:
+    """Keyword-based category, used when the LLM gives no usable answer"""
+    matches = keyword_matches(title.lower())
+    return matches[0] if matches else "other"
+
+# Identifies the deploy in cache keys, so cached results from one build aren't reused by the next
+BUILD_ID = os.getenv("BUILD_ID", "dev")
+
+# L1 cache of title -> category; Pinecone keeps returning the same top items
+title_category_cache = LRUCache(maxsize=10000)
+title_cache_stats = {"hits": 0, "keyword": 0, "redis": 0, "misses": 0}
+# L2 copy in Redis (when configured) so classifications survive restarts and
+# are shared between workers - the catalog barely changes, so keep them a day
+TITLE_CATEGORY_REDIS_TTL = 86400
+# Bump when title_classifier_template changes, so old labels aren't reused
+TITLE_CLASSIFIER_VERSION = "2"
+
+def title_redis_key(title: str) -> str:
+    digest = hashlib.blake2b(title.encode(), digest_size=16).hexdigest()
+    return f"cls:{BUILD_ID}:{TITLE_CLASSIFIER_VERSION}:{digest}"
+
+def title_cache_info() -> dict:
+    """Hit/miss counters for the title classification cache"""
+    return {
+        **title_cache_stats,
+        "size": len(title_category_cache),
+        "maxsize": title_category_cache.maxsize
+    }
+
+async def classify_product_titles_batch(titles: List[str]) -> tuple:
+    """Classify the PRIMARY category of every title, with at most one LLM call.
+    
+    Returns (categories, used_fallback); used_fallback is True when the LLM
+    failed and some titles were labelled by keywords alone.
+    """
+    resolved = {}
+    used_fallback = False
+    missing = []  # each ambiguous title is sent once
+    for title in dict.fromkeys(titles):
+        if title in title_category_cache:
+            resolved[title] = title_category_cache[title]
+            title_cache_stats["hits"] += 1
+            continue
+        # Most titles clearly name their category - no need for the LLM
+        category = fast_keyword_classify(title.lower())
+        if category:
+            resolved[title] = category
+            title_category_cache[title] = category
+            title_cache_stats["keyword"] += 1
+        else:
+            missing.append(title)
+    
+    redis = ml_models.get("redis")
+    if missing and redis is not None:
+        try:
+            stored = await redis.mget([title_redis_key(title) for title in missing])
+            for title, category in zip(missing, stored):
+                if category:
+                    resolved[title] = category
+                    title_category_cache[title] = category
+                    title_cache_stats["redis"] += 1
+            missing = [title for title in missing if title not in resolved]
+        except Exception as e:
+            print(f"    ⚠️ Redis title cache error: {e}")
+    title_cache_stats["misses"] += len(missing)
+    
+    if missing:
+        try:
+            # JSON-encode the titles so quotes or newlines inside one can't merge entries
+            result = await call_groq("title_classifier_chain", {"titles": json.dumps(missing, ensure_ascii=False)})
+            categories = clean_json_list(result)
+        except Exception as e:
+            print(f"    ⚠️ Classification error: {e}")
+            categories = []
         
-        # Fallback to keyword matching if LLM returns invalid category
-        title_lower = title.lower()
-        if any(kw in title_lower for kw in ["sofa", "couch", "sectional", "loveseat"]):
-            return "sofa"
-        elif any(kw in title_lower for kw in ["chair", "recliner"]):
-            return "chair"
-        elif any(kw in title_lower for kw in ["bed", "bedframe"]):
-            return "bed"
-        elif any(kw in title_lower for kw in ["table", "desk"]):
-            return "table"
-        elif any(kw in title_lower for kw in ["ottoman", "footstool"]):
-            return "ottoman"
+        if len(categories) == len(missing):
+            # Validate each is a known category; only real LLM labels are cached
+            llm_labels = {}
+            for title, category in zip(missing, categories):
+                category = str(category).strip().lower()
+                if category in VALID_CATEGORIES:
+                    llm_labels[title] = category
+                    title_category_cache[title] = category
+                else:
+                    category = keyword_classify(title)
+                    used_fallback = True
+                resolved[title] = category
+            if redis is not None and llm_labels:
+                run_in_background(store_title_categories(redis, llm_labels))
         else:
-            return "other"
-            
+            # Fallback to keyword matching if LLM didn't return one answer per title.
+            # Not cached, so the LLM gets another chance on the next search.
+            print(f"    ⚠️ Classifier returned {len(categories)} labels for {len(missing)} titles, using keywords")
+            for title in missing:
+                resolved[title] = keyword_classify(title)
+            used_fallback = True
+    
+    return [resolved[title] for title in titles], used_fallback
+
+async def store_title_categories(redis, categories: dict):
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for title, category in categories.items():
+                pipe.set(title_redis_key(title), category, ex=TITLE_CATEGORY_REDIS_TTL)
+            await pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Redis title cache store error: {e}")
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected mid-run
+background_tasks = set()
+
+def run_in_background(coro):
+    """Schedule work that the response shouldn't wait on"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# L1 exact-match cache over the full prompt inputs (query, history, products...)
+prompt_cache = LRUCache(maxsize=4096)
+
+def prompt_cache_key(chain_name: str, payload: dict) -> str:
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return chain_name + ":" + hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+async def invoke_cached(chain_name: str, payload: dict, prompt: str) -> str:
+    """Invoke a chain through the exact-match cache, then its semantic cache (if any)"""
+    exact_key = prompt_cache_key(chain_name, payload)
+    if exact_key in prompt_cache:
+        return prompt_cache[exact_key]
+    
+    result = await invoke_with_semantic_cache(chain_name, payload, prompt)
+    prompt_cache[exact_key] = result
+    return result
+
+async def stream_cached(chain_name: str, payload: dict, on_delta: Callable[[str], Awaitable[None]]) -> str:
+    """Stream a chain's output through on_delta, unless the exact-match cache has it"""
+    exact_key = prompt_cache_key(chain_name, payload)
+    if exact_key in prompt_cache:
+        return prompt_cache[exact_key]
+    
+    result = await stream_groq(chain_name, payload, on_delta)
+    prompt_cache[exact_key] = result
+    return result
+
+def filter_signature(prompt: str) -> tuple:
+    """The filter values a prompt names; semantic hits must agree on every one"""
+    prompt_lower = prompt.lower()
+    return (
+        DIGITS_RE.findall(prompt),
+        sorted(COLOR_RE.findall(prompt_lower)),
+        sorted(m.replace('wooden', 'wood') for m in MATERIAL_RE.findall(prompt_lower)),
+        bool(LARGE_QUERY_RE.search(prompt_lower)),
+        bool(SMALL_QUERY_RE.search(prompt_lower)),
+        sorted(token.lower() for token in BRAND_TOKEN_RE.findall(prompt))
+    )
+
+async def invoke_with_semantic_cache(chain_name: str, payload: dict, prompt: str) -> str:
+    """Invoke a chain, answering near-duplicate prompts from its semantic cache"""
+    cache = ml_models["semantic_caches"].get(chain_name)
+    if cache is not None:
+        try:
+            hits = await asyncio.to_thread(cache.check, prompt=prompt, num_results=1)
+            # "under $100"/"under $200" and "red ones"/"blue ones" embed almost
+            # identically - never reuse an answer unless the filters match too
+            if hits and filter_signature(hits[0]["prompt"]) == filter_signature(prompt):
+                print(f"⚡ Semantic cache hit ({chain_name}): '{hits[0]['prompt']}'")
+                return hits[0]["response"]
+        except Exception as e:
+            print(f"⚠️ Semantic cache lookup error: {e}")
+    
+    result = await call_groq(chain_name, payload)
+    
+    if cache is not None:
+        # Storing needs an embed + Redis write; don't make the user wait for it
+        run_in_background(store_in_semantic_cache(cache, prompt, result))
+    return result
+
+async def store_in_semantic_cache(cache: SemanticCache, prompt: str, response: str):
+    try:
+        await asyncio.to_thread(cache.store, prompt=prompt, response=response)
     except Exception as e:
-        print(f"    ⚠️ Classification error: {e}")
-        return "other"
+        print(f"⚠️ Semantic cache store error: {e}")
 
 def clean_json(text: str) -> dict:
     """Extract JSON from LLM response"""
@@ -241,11 +773,63 @@ def clean_json(text: str) -> dict:
         pass
     return {}
 
+INTENT_RE = re.compile(r'\b(GREETING|FOLLOW_UP|QUESTION|SEARCH)\b')
+
+def parse_intent_and_params(text: str) -> tuple:
+    """Split a combined_chain response into (intent, search params).
+    
+    intent is None if no intent word was found; params is None unless
+    JSON follows the intent.
+    """
+    match = INTENT_RE.search(text.upper())
+    if not match:
+        return None, None
+    params = clean_json(text[match.end():])
+    return match.group(1), params or None
+
+async def classify_intent_by_embedding(text: str) -> Optional[str]:
+    """Nearest intent prototype by cosine similarity, or None if it's a close call"""
+    embedding = await asyncio.to_thread(
+        ml_models["text_model"].encode,
+        text,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+    scores = ml_models["intent_prototypes"] @ embedding
+    labels = ml_models["intent_labels"]
+    best_per_intent = sorted(
+        ((float(scores[labels == intent].max()), intent) for intent in INTENT_EXAMPLES),
+        reverse=True
+    )
+    (best_score, best_intent), (runner_up_score, _) = best_per_intent[0], best_per_intent[1]
+    
+    if best_score < INTENT_MIN_SIMILARITY or best_score - runner_up_score < INTENT_MIN_MARGIN:
+        return None
+    print(f"🧭 Embedding intent: {best_intent} ({best_score:.2f})")
+    return best_intent
+
+def clean_json_list(text: str) -> list:
+    """Extract JSON array from LLM response"""
+    try:
+        start = text.find('[')
+        end = text.rfind(']') + 1
+        if start != -1 and end > start:
+            parsed = json.loads(text[start:end])
+            if isinstance(parsed, list):
+                return parsed
+    except:
+        pass
+    return []
+
 def extract_price(price_str: str) -> Optional[float]:
     """Extract numeric price"""
     if not price_str or price_str == 'N/A':
         return None
-    match = re.search(r'\d+\.?\d*', price_str.replace('$', '').replace(',', ''))
+    cleaned = price_str.translate(_STRIP_CURRENCY)
+    # Most catalog prices are a bare number once "$" and "," are gone
+    if cleaned.replace('.', '', 1).isdecimal():
+        return float(cleaned)
+    match = PRICE_RE.search(cleaned)
     return float(match.group()) if match else None
 
 def generate_summary(title: str, desc: str) -> dict:
@@ -253,19 +837,9 @@ def generate_summary(title: str, desc: str) -> dict:
     features = []
     text = f"{title} {desc}".lower()
     
-    feature_patterns = [
-        (r'(\d+\s*(?:drawer|shelf|shelves|tier|piece|seater|seat)s?)', 1),
-        (r'(adjustable|foldable|convertible|extendable|reclining)', 1),
-        (r'(storage|space-saving)', 1),
-        (r'(ergonomic|lumbar support)', 1),
-        (r'(upholstered|cushioned|padded)', 1),
-        (r'(leather|velvet|linen|wood|metal)', 2),
-        (r'(modular|sectional)', 1),
-    ]
-    
     found = []
-    for pattern, priority in feature_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern, priority in FEATURE_PATTERNS:
+        matches = pattern.findall(text)
         for match in matches[:1]:
             found.append((match, priority))
     
@@ -294,48 +868,324 @@ def generate_summary(title: str, desc: str) -> dict:
     
     return {"key_features": features, "best_for": best_for}
 
+# Filter keywords as single alternations, so each check is one regex scan.
+# Size words only anchor at the start so "larger"/"bigger" still count.
+LARGE_TITLE_RE = re.compile(r'\b(?:large|oversized|big|xl|king|queen)')
+SMALL_TITLE_RE = re.compile(r'\b(?:small|compact|mini|twin)')
+LARGE_QUERY_RE = re.compile(r'\b(?:large|big|oversized)')
+SMALL_QUERY_RE = re.compile(r'\b(?:small|compact|mini)')
+COLOR_RE = re.compile(r'\b(?:red|blue|green|black|white|gray|grey|brown|yellow|navy|beige|tan)\b')
+MATERIAL_RE = re.compile(r'\b(?:wood(?:en)?|metal|fabric|leather|velvet|plastic)\b')
+
+def filter_products(products: List[Product], filters: dict) -> List[Product]:
+    """Apply follow-up filters to displayed products using vectorized masks"""
+    df = pd.DataFrame([p.model_dump() for p in products])
+    title_lower = df['title'].str.lower()
+    
+    def field_lower(column: str) -> pd.Series:
+        return df[column].fillna('').astype(str).str.lower()
+    
+    # Each check is (mask of products that pass, reason shown for the ones that don't)
+    checks = []
+    
+    # Price filter - products with no parseable price are kept
+    if filters.get('price_max'):
+        price_num = pd.to_numeric(
+            field_lower('price')
+            .str.replace(r'[$,]', '', regex=True)
+            .str.extract(f"({PRICE_RE.pattern})", expand=False),
+            errors='coerce'
+        )
+        checks.append((~(price_num > filters['price_max']), f"price > ${filters['price_max']}"))
+    
+    # Color filter
+    if filters.get('color'):
+        color_req = filters['color'].lower()
+        mask = (title_lower.str.contains(color_req, regex=False)
+                | field_lower('color').str.contains(color_req, regex=False))
+        checks.append((mask, f"color doesn't match '{filters['color']}'"))
+    
+    # Size filter
+    if filters.get('size'):
+        size = filters['size'].lower()
+        if size == 'large':
+            checks.append((title_lower.str.contains(LARGE_TITLE_RE), "not large"))
+        elif size == 'small':
+            checks.append((title_lower.str.contains(SMALL_TITLE_RE), "not small"))
+    
+    # Material filter
+    if filters.get('material'):
+        material_req = filters['material'].lower()
+        mask = (title_lower.str.contains(material_req, regex=False)
+                | field_lower('material').str.contains(material_req, regex=False))
+        checks.append((mask, f"material doesn't match '{filters['material']}'"))
+    
+    # Brand filter
+    if filters.get('brand'):
+        brand_req = filters['brand'].lower()
+        checks.append((field_lower('brand').str.contains(brand_req, regex=False),
+                       f"brand doesn't match '{filters['brand']}'"))
+    
+    keep = pd.Series(True, index=df.index)
+    for mask, _ in checks:
+        keep &= mask
+    
+    for i, product in enumerate(products):
+        if keep.iat[i]:
+            print(f"  ✅ Kept: {product.title[:60]}")
+        else:
+            reason = next(reason for mask, reason in checks if not mask.iat[i])
+            print(f"  ❌ Filtered out: {product.title[:60]} ({reason})")
+    
+    return [products[i] for i in df.index[keep]]
+
+def render_product_context(i: int, p: Product) -> str:
+    """One product's block for the Q&A prompt"""
+    lines = [f"Product #{i}:", f"  Title: {p.title}", f"  Price: {p.price}"]
+    brand, dimensions, material, color, key_features = p.brand, p.dimensions, p.material, p.color, p.key_features
+    if brand:
+        lines.append(f"  Brand: {brand}")
+    if dimensions:
+        lines.append(f"  Dimensions: {dimensions}")
+    if material:
+        lines.append(f"  Material: {material}")
+    if color:
+        lines.append(f"  Color: {color}")
+    if key_features:
+        lines.append(f"  Features: {', '.join(key_features)}")
+    return "\n".join(lines)
+
 def format_product_context(products: List[Product]) -> str:
     """Format products for Q&A with full details"""
     if not products:
         return "No products displayed."
     
-    context = ""
-    for i, p in enumerate(products, 1):
-        context += f"\n\nProduct #{i}:"
-        context += f"\n  Title: {p.title}"
-        context += f"\n  Price: {p.price}"
-        if p.brand:
-            context += f"\n  Brand: {p.brand}"
-        if p.dimensions:
-            context += f"\n  Dimensions: {p.dimensions}"
-        if p.material:
-            context += f"\n  Material: {p.material}"
-        if p.color:
-            context += f"\n  Color: {p.color}"
-        if p.key_features:
-            context += f"\n  Features: {', '.join(p.key_features)}"
-    return context
+    return "\n\n" + "\n\n".join(render_product_context(i, p) for i, p in enumerate(products, 1))
 
 def format_product_list_brief(products: List[Product]) -> str:
     """Brief product list for filter parsing"""
-    return "\n".join([f"{i+1}. {p.title} - {p.price}" for i, p in enumerate(products)])
+    return "\n".join(f"{i}. {p.title} - {p.price}" for i, p in enumerate(products, 1))
+
+# Search results cache: similar searches ("sofas", "find sofas") parse to the same params.
+# BUILD_ID keeps entries from one deploy from leaking into the next.
+search_cache = TTLCache(maxsize=512, ttl=300)
+
+def search_cache_key(params: dict, query_text: str) -> tuple:
+    """Normalized key for everything search_and_classify depends on"""
+    category = params.get("category", "other")
+    return (
+        BUILD_ID,
+        category,
+        (params.get('material') or '').lower() or None,
+        (params.get('color') or '').lower() or None,
+        params.get('price_max'),
+        # Unknown categories search on the raw query text
+        None if category in CATEGORY_SEARCH_TEXT else query_text.strip().lower()
+    )
+
+async def search_and_classify(
+    params: dict,
+    query_text: str,
+    on_candidates: Optional[Callable[[list], Awaitable[None]]] = None
+) -> Optional[list]:
+    """Embed -> Pinecone -> classify -> filter. Returns None if Pinecone found nothing.
+    
+    on_candidates is awaited with the raw Pinecone matches before classification.
+    """
+    key = search_cache_key(params, query_text)
+    if key in search_cache:
+        print(f"⚡ Search cache hit: {key[1:]}")
+        return search_cache[key]
+    
+    matched_products, cacheable = await _search_and_classify(params, query_text, on_candidates)
+    # Keyword-fallback results aren't cached, so the LLM gets another chance next time
+    if cacheable:
+        search_cache[key] = matched_products
+    return matched_products
+
+async def _search_and_classify(params: dict, query_text: str, on_candidates) -> tuple:
+    """(matched products or None, whether the result is safe to cache)"""
+    category = params.get("category", "other")
+    
+    # If category is unclear, do broad search
+    search_text = CATEGORY_SEARCH_TEXT.get(category, query_text)
+    
+    # Known categories reuse the vectors embedded at startup; only raw queries
+    # need a live encode (blocking, so run it off the event loop)
+    query_embedding = ml_models["category_query_vectors"].get(category)
+    if query_embedding is None:
+        text_embedding = await asyncio.to_thread(
+            ml_models["text_model"].encode,
+            search_text,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        query_embedding = build_query_vector(text_embedding)
+    
+    print(f"🔎 Searching: '{search_text}' (category: {category})")
+    
+    # Get candidates from Pinecone
+    results = await asyncio.to_thread(
+        index.query,
+        vector=query_embedding,
+        top_k=20,
+        include_metadata=True
+    )
+    
+    print(f"📊 Pinecone returned {len(results['matches'])} candidates")
+    
+    if not results['matches']:
+        return None, True
+    
+    if on_candidates is not None:
+        await on_candidates(results['matches'])
+    
+    # INTELLIGENT FILTERING using LLM to understand product titles
+    # Classify all candidates in a single LLM call instead of one per title
+    product_categories, used_fallback = await classify_product_titles_batch(
+        [match['metadata'].get('title', '') for match in results['matches']]
+    )
+    
+    # Read the requested filters once, not on every candidate
+    material_req = (params.get('material') or '').lower() or None
+    color_req = (params.get('color') or '').lower() or None
+    price_max = params.get('price_max')
+    
+    matched_products = []
+    
+    for match, product_category in zip(results['matches'], product_categories):
+        md = match['metadata']
+        title = md.get('title', '')
+        
+        # Check if it matches what user is looking for
+        if category != "other" and product_category != category:
+            print(f"  ❌ '{title[:80]}...'")
+            print(f"     Product is: {product_category}, User wants: {category}")
+            continue
+        
+        print(f"  ✅ '{title[:80]}...'")
+        print(f"     Classified as: {product_category} ✓")
+        
+        # Apply metadata filters
+        keep = True
+        title_lower = title.lower()
+        
+        # Material filter
+        if material_req and material_req not in title_lower and material_req not in md.get('material', '').lower():
+            print(f"    ❌ Material mismatch (want: {material_req})")
+            keep = False
+        
+        # Color filter
+        if keep and color_req and color_req not in title_lower and color_req not in md.get('color', '').lower():
+            print(f"    ❌ Color mismatch (want: {color_req})")
+            keep = False
+        
+        # Price filter
+        if keep and price_max:
+            price = extract_price(md.get('price', ''))
+            if price and price > price_max:
+                print(f"    ❌ Price too high: ${price} > ${price_max}")
+                keep = False
+        
+        if keep:
+            matched_products.append(match)
+    
+    return matched_products, not used_fallback
+
+def build_recommendation(match) -> dict:
+    """Product card payload for a Pinecone match"""
+    metadata = match['metadata']
+    summary = generate_summary(
+        metadata.get('title', ''),
+        metadata.get('description', '')
+    )
+    
+    return {
+        "id": match['id'],
+        "title": metadata.get('title', 'Product'),
+        "image": metadata.get('image'),
+        "price": metadata.get('price', 'N/A'),
+        "brand": metadata.get('brand'),
+        "score": round(match['score'], 3),
+        "key_features": summary['key_features'],
+        "best_for": summary['best_for'],
+        "dimensions": metadata.get('package_dimensions'),
+        "material": metadata.get('material'),
+        "color": metadata.get('color')
+    }
+
+EventCallback = Callable[[dict], Awaitable[None]]
+
+# Only the most recent turns go into LLM prompts (the frontend sends no more than this)
+HISTORY_TURNS = 4
 
 @app.post("/recommend")
-def recommend_products(query: ConversationalQuery):
-    history_text = "\n".join([f"{m.from_user}: {m.text}" for m in query.history[-6:]])
+async def recommend_products(query: ConversationalQuery):
+    return await recommend(query)
+
+@app.post("/recommend/stream")
+async def recommend_products_stream(query: ConversationalQuery):
+    """NDJSON stream: optional "preview"/"delta" events, then the same final response as /recommend"""
+    return StreamingResponse(stream_recommend_events(query), media_type="application/x-ndjson")
+
+async def stream_recommend_events(query: ConversationalQuery):
+    queue = asyncio.Queue()
+    
+    async def produce():
+        try:
+            await queue.put(await recommend(query, on_event=queue.put))
+        except Exception as e:
+            print(f"⚠️ Stream error: {e}")
+            await queue.put({"type": "error", "response": "Sorry, something went wrong. Please try again."})
+        finally:
+            await queue.put(None)
     
-    # 1. DETECT INTENT
+    task = asyncio.create_task(produce())
     try:
-        intent_result = ml_models["intent_chain"].invoke({
-            "query": query.query,
-            "history": history_text
-        })
-        # Extract first word only to handle verbose LLM responses
-        intent = intent_result.strip().split()[0].upper()
-        print(f"💡 Intent: {intent}")
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield json.dumps(event) + "\n"
+    finally:
+        # Client disconnected mid-stream - stop working on its request
+        task.cancel()
+
+async def recommend(query: ConversationalQuery, on_event: Optional[EventCallback] = None) -> dict:
+    """Answer a conversational query; on_event receives early partial results"""
+    # 1. DETECT INTENT - embedding match first, then one LLM call that also parses the search
+    intent, params = None, None
+    try:
+        intent = await classify_intent_by_embedding(query.query)
     except Exception as e:
-        print(f"⚠️ Intent error: {e}")
-        intent = "SEARCH"
+        print(f"⚠️ Embedding intent error: {e}")
+    
+    # Only the LLM intent chains read the history
+    history_text = ""
+    if intent is None:
+        history_text = "\n".join(f"{m.from_user}: {m.text}" for m in query.history[-HISTORY_TURNS:])
+        try:
+            combined_result = await invoke_cached("combined_chain", {
+                "query": query.query,
+                "history": history_text
+            }, prompt=query.query)
+            intent, params = parse_intent_and_params(combined_result)
+        except Exception as e:
+            print(f"⚠️ Combined intent/parse error: {e}")
+    
+    if intent is None:
+        # Fall back to the dedicated intent chain
+        try:
+            intent_result = await invoke_cached("intent_chain", {
+                "query": query.query,
+                "history": history_text
+            }, prompt=query.query)
+            # Extract first word only to handle verbose LLM responses
+            intent = intent_result.strip().split()[0].upper()
+        except Exception as e:
+            print(f"⚠️ Intent error: {e}")
+            intent = "SEARCH"
+    print(f"💡 Intent: {intent}")
     
     # 2. GREETING
     if "GREETING" in intent:
@@ -349,10 +1199,17 @@ def recommend_products(query: ConversationalQuery):
         print("❓ Answering question about displayed products")
         try:
             product_context = format_product_context(query.last_products)
-            answer = ml_models["qa_chain"].invoke({
+            qa_payload = {
                 "products": product_context,
                 "query": query.query
-            })
+            }
+            if on_event is not None:
+                # Stream the answer as it is written; the final event still carries all of it
+                async def send_delta(text: str):
+                    await on_event({"type": "delta", "text": text})
+                answer = await stream_cached("qa_chain", qa_payload, on_delta=send_delta)
+            else:
+                answer = await invoke_cached("qa_chain", qa_payload, prompt=query.query)
             return {"type": "answer", "response": answer}
         except Exception as e:
             print(f"⚠️ Q&A error: {e}")
@@ -365,10 +1222,10 @@ def recommend_products(query: ConversationalQuery):
         # Use LLM to parse filters
         try:
             product_list = format_product_list_brief(query.last_products)
-            filter_result = ml_models["followup_chain"].invoke({
+            filter_result = await invoke_cached("followup_chain", {
                 "product_list": product_list,
                 "query": query.query
-            })
+            }, prompt=query.query)
             filters = clean_json(filter_result)
             print(f"🔍 Extracted filters: {filters}")
         except Exception as e:
@@ -380,91 +1237,28 @@ def recommend_products(query: ConversationalQuery):
             query_lower = query.query.lower()
             
             # More robust price extraction
-            price_match = re.search(r'(?:under|below|less than|<)\s*\$?\s*(\d+)', query_lower)
+            price_match = PRICE_MAX_RE.search(query_lower)
             if not price_match:
-                price_match = re.search(r'\$?\s*(\d+)\s*\$', query_lower)  # "130$" format
+                price_match = PRICE_SUFFIX_RE.search(query_lower)
             if price_match:
                 filters['price_max'] = float(price_match.group(1))
                 print(f"  💰 Extracted price from fallback: {filters['price_max']}")
             
-            if any(w in query_lower for w in ['large', 'big', 'oversized']):
+            if LARGE_QUERY_RE.search(query_lower):
                 filters['size'] = 'large'
-            elif any(w in query_lower for w in ['small', 'compact', 'mini']):
+            elif SMALL_QUERY_RE.search(query_lower):
                 filters['size'] = 'small'
             
-            colors = ['red', 'blue', 'green', 'black', 'white', 'gray', 'grey', 'brown', 'yellow', 'navy', 'beige', 'tan']
-            for color in colors:
-                if color in query_lower:
-                    filters['color'] = color
-                    break
+            color_match = COLOR_RE.search(query_lower)
+            if color_match:
+                filters['color'] = color_match.group(0)
             
-            materials = ['wood', 'wooden', 'metal', 'fabric', 'leather', 'velvet', 'plastic']
-            for material in materials:
-                if material in query_lower:
-                    filters['material'] = material.replace('wooden', 'wood')
-                    break
+            material_match = MATERIAL_RE.search(query_lower)
+            if material_match:
+                filters['material'] = material_match.group(0).replace('wooden', 'wood')
         
         # Apply filters
-        filtered = []
-        for product in query.last_products:
-            keep = True
-            reasons = []
-            
-            # Price filter
-            if filters.get('price_max'):
-                price = extract_price(product.price)
-                if price and price > filters['price_max']:
-                    keep = False
-                    reasons.append(f"price ${price:.2f} > ${filters['price_max']}")
-            
-            # Color filter
-            if keep and filters.get('color'):
-                color_req = filters['color'].lower()
-                title_lower = product.title.lower()
-                color_meta = (product.color or '').lower()
-                
-                if color_req not in title_lower and color_req not in color_meta:
-                    keep = False
-                    reasons.append(f"color doesn't match '{filters['color']}'")
-            
-            # Size filter
-            if keep and filters.get('size'):
-                size = filters['size'].lower()
-                title_lower = product.title.lower()
-                
-                if size == 'large':
-                    if not any(w in title_lower for w in ['large', 'oversized', 'big', 'xl', 'king', 'queen']):
-                        keep = False
-                        reasons.append("not large")
-                elif size == 'small':
-                    if not any(w in title_lower for w in ['small', 'compact', 'mini', 'twin']):
-                        keep = False
-                        reasons.append("not small")
-            
-            # Material filter
-            if keep and filters.get('material'):
-                material_req = filters['material'].lower()
-                title_lower = product.title.lower()
-                material_meta = (product.material or '').lower()
-                
-                if material_req not in title_lower and material_req not in material_meta:
-                    keep = False
-                    reasons.append(f"material doesn't match '{filters['material']}'")
-            
-            # Brand filter
-            if keep and filters.get('brand'):
-                brand_req = filters['brand'].lower()
-                brand_meta = (product.brand or '').lower()
-                
-                if brand_req not in brand_meta:
-                    keep = False
-                    reasons.append(f"brand doesn't match '{filters['brand']}'")
-            
-            if keep:
-                print(f"  ✅ Kept: {product.title[:60]}")
-                filtered.append(product)
-            else:
-                print(f"  ❌ Filtered out: {product.title[:60]} ({', '.join(reasons)})")
+        filtered = filter_products(query.last_products, filters)
         
         # Return results
         if filtered:
@@ -474,7 +1268,7 @@ def recommend_products(query: ConversationalQuery):
             msg = f"I found {num} product{'s' if num > 1 else ''} matching your criteria:"
             return {
                 "type": "products",
-                "recommendations": [p.dict() for p in filtered],
+                "recommendations": [p.model_dump() for p in filtered],
                 "response": msg
             }
         else:
@@ -504,14 +1298,15 @@ def recommend_products(query: ConversationalQuery):
     # 5. SEARCH - Use LLM to parse, then strict rules to validate
     print("🔎 New product search")
     
-    # Parse with LLM
-    try:
-        query_result = ml_models["query_chain"].invoke({"query": query.query})
-        params = clean_json(query_result)
-        print(f"📋 LLM parsed: {params}")
-    except Exception as e:
-        print(f"⚠️ Parse error: {e}")
-        params = {"category": "other"}
+    # Parse with LLM, unless the combined call already did
+    if params is None:
+        try:
+            query_result = await invoke_cached("query_chain", {"query": query.query}, prompt=query.query)
+            params = clean_json(query_result)
+        except Exception as e:
+            print(f"⚠️ Parse error: {e}")
+            params = {"category": "other"}
+    print(f"📋 LLM parsed: {params}")
     
     category = params.get("category", "other")
     
@@ -523,88 +1318,35 @@ def recommend_products(query: ConversationalQuery):
             "response": "I couldn't find any furniture matching your search. This is a furniture store - try searching for sofas, beds, chairs, tables, or other home furnishings."
         }
     
-    # If category is unclear, do broad search
-    if category == "other":
-        search_text = query.query
-    else:
-        # Use category keywords for better embedding
-        category_search = {
-            "sofa": "sofa couch sectional living room seating",
-            "bed": "bed frame bedroom sleeping",
-            "chair": "chair seating dining office",
-            "table": "table desk surface",
-            "ottoman": "ottoman footstool",
-            "storage": "dresser nightstand storage cabinet"
-        }
-        search_text = category_search.get(category, query.query)
-    
-    text_embedding = ml_models["text_model"].encode(search_text).tolist()
-    query_embedding = text_embedding + [0.0] * 768
-    
-    print(f"🔎 Searching: '{search_text}' (category: {category})")
+    async def send_preview(candidates: list):
+        # Show the closest raw matches while the classifier runs, skipping
+        # accessories and ones whose title plainly names a different category
+        def previewable(title_lower: str) -> bool:
+            return not ACCESSORY_RE.search(title_lower) and fast_keyword_classify(title_lower) in (None, category)
+        
+        preview = [
+            match for match in candidates
+            if category == "other"
+            or previewable(match['metadata'].get('title', '').lower())
+        ][:3]
+        if preview:
+            await on_event({
+                "type": "preview",
+                "recommendations": [build_recommendation(match) for match in preview],
+                "response": "Here's a first look while I refine the results..."
+            })
     
-    # Get candidates from Pinecone
-    results = index.query(
-        vector=query_embedding,
-        top_k=20,
-        include_metadata=True
+    matched_products = await search_and_classify(
+        params,
+        query.query,
+        on_candidates=send_preview if on_event is not None else None
     )
-    
-    print(f"📊 Pinecone returned {len(results['matches'])} candidates")
-    
-    if not results['matches']:
+    if matched_products is None:
         return {
             "type": "no_results",
             "response": "I couldn't find any products."
         }
     
-    # INTELLIGENT FILTERING using LLM to understand product titles
-    matched_products = []
-    
-    for match in results['matches']:
-        title = match['metadata'].get('title', '')
-        
-        # Use LLM to classify the product's PRIMARY category
-        product_category = classify_product_title(title)
-        
-        # Check if it matches what user is looking for
-        if category != "other" and product_category != category:
-            print(f"  ❌ '{title[:80]}...'")
-            print(f"     Product is: {product_category}, User wants: {category}")
-            continue
-        
-        print(f"  ✅ '{title[:80]}...'")
-        print(f"     Classified as: {product_category} ✓")
-        
-        # Apply metadata filters
-        keep = True
-        
-        # Material filter
-        if params.get('material'):
-            material_req = params['material'].lower()
-            material_meta = match['metadata'].get('material', '').lower()
-            if material_req not in title.lower() and material_req not in material_meta:
-                print(f"    ❌ Material mismatch (want: {material_req})")
-                keep = False
-        
-        # Color filter
-        if keep and params.get('color'):
-            color_req = params['color'].lower()
-            color_meta = match['metadata'].get('color', '').lower()
-            if color_req not in title.lower() and color_req not in color_meta:
-                print(f"    ❌ Color mismatch (want: {color_req})")
-                keep = False
-        
-        # Price filter
-        if keep and params.get('price_max'):
-            price = extract_price(match['metadata'].get('price', ''))
-            if price and price > params['price_max']:
-                print(f"    ❌ Price too high: ${price} > ${params['price_max']}")
-                keep = False
-        
-        if keep:
-            matched_products.append(match)
-    
     print(f"🎯 Final matches: {len(matched_products)} products")
     
     # Check if there's a perfect/near-perfect match (very high similarity score)
@@ -643,27 +1385,7 @@ def recommend_products(query: ConversationalQuery):
             "response": "I couldn't find any furniture matching your search. Try different keywords or filters."
         }
     
-    recommendations = []
-    for match in matched_products:
-        metadata = match['metadata']
-        summary = generate_summary(
-            metadata.get('title', ''),
-            metadata.get('description', '')
-        )
-        
-        recommendations.append({
-            "id": match['id'],
-            "title": metadata.get('title', 'Product'),
-            "image": metadata.get('image'),
-            "price": metadata.get('price', 'N/A'),
-            "brand": metadata.get('brand'),
-            "score": round(match['score'], 3),
-            "key_features": summary['key_features'],
-            "best_for": summary['best_for'],
-            "dimensions": metadata.get('package_dimensions'),
-            "material": metadata.get('material'),
-            "color": metadata.get('color')
-        })
+    recommendations = [build_recommendation(match) for match in matched_products]
     
     num = len(recommendations)
     if num == 1:
@@ -679,116 +1401,95 @@ def recommend_products(query: ConversationalQuery):
         "response": msg
     }
 
-@app.get("/analytics")
-def get_analytics():
-    try:
-        stats = index.describe_index_stats()
-        total_vectors = stats.get('total_vector_count', 0)
-        
-        if total_vectors > 0:
-            # Fetch sample for analytics (max 1000 in free tier)
-            fetch_response = index.query(
-                vector=[0.0] * 1152, 
-                top_k=min(total_vectors, 1000), 
-                include_metadata=True
-            )
-            df = pd.DataFrame([match['metadata'] for match in fetch_response['matches']])
-        else:
-            df = pd.DataFrame()
+# One quoted item of a stringified list: 'single' or "double" (used when the item has a ')
+CATEGORY_ITEM_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
 
-        if not df.empty:
-            # Top brands
-            top_brands = df['brand'].value_counts().nlargest(10).reset_index()
-            top_brands.columns = ['name', 'count']
-            
-            # Top categories
-            all_categories = []
-            for cat_str in df['categories'].dropna():
-                try:
-                    cats = ast.literal_eval(cat_str)
-                    if isinstance(cats, list):
-                        all_categories.extend(cats)
-                except (ValueError, SyntaxError):
-                    pass
-            
-            category_counts = Counter(all_categories)
-            top_categories = [
-                {"name": cat, "count": count} 
-                for cat, count in category_counts.most_common(15)
-            ]
-            
-            # Price analytics
-            prices = []
-            for price_str in df['price'].dropna():
-                match = re.search(r'\d+\.?\d*', str(price_str).replace('$', '').replace(',', ''))
-                if match:
-                    prices.append(float(match.group()))
-            
-            # Price distribution (buckets)
-            price_distribution = []
-            if prices:
-                price_ranges = [
-                    ("$0-50", 0, 50),
-                    ("$50-100", 50, 100),
-                    ("$100-200", 100, 200),
-                    ("$200-500", 200, 500),
-                    ("$500-1000", 500, 1000),
-                    ("$1000+", 1000, float('inf'))
-                ]
-                
-                for range_label, min_price, max_price in price_ranges:
-                    count = sum(1 for p in prices if min_price <= p < max_price)
-                    if count > 0:
-                        price_distribution.append({
-                            "range": range_label,
-                            "count": count
-                        })
-            
-            # Average price
-            avg_price = sum(prices) / len(prices) if prices else 0
-            
-            # Most/Least expensive products
-            most_expensive = None
-            least_expensive = None
-            if prices:
-                max_price = max(prices)
-                min_price = min(prices)
-                
-                for _, row in df.iterrows():
-                    price_str = str(row.get('price', ''))
-                    match = re.search(r'\d+\.?\d*', price_str.replace('$', '').replace(',', ''))
-                    if match:
-                        price_val = float(match.group())
-                        if price_val == max_price and not most_expensive:
-                            most_expensive = {
-                                "title": row.get('title', 'Unknown'),
-                                "price": row.get('price', 'N/A')
-                            }
-                        if price_val == min_price and not least_expensive:
-                            least_expensive = {
-                                "title": row.get('title', 'Unknown'),
-                                "price": row.get('price', 'N/A')
-                            }
-            
-            # Category metrics for radar chart
-            category_metrics = [
-                {"category": cat["name"][:15], "count": cat["count"]} 
-                for cat in top_categories[:8]
-            ]
-            
-            return {
-                "total_products": total_vectors,
-                "top_brands": top_brands.to_dict('records'),
-                "top_categories": top_categories,
-                "price_distribution": price_distribution,
-                "average_price": round(avg_price, 2),
-                "most_expensive": most_expensive,
-                "least_expensive": least_expensive,
-                "category_metrics": category_metrics
-            }
-            
+# Price distribution buckets: [edge_i, edge_i+1)
+PRICE_BUCKET_EDGES = [0, 50, 100, 200, 500, 1000, np.inf]
+PRICE_BUCKET_LABELS = ["$0-50", "$50-100", "$100-200", "$200-500", "$500-1000", "$1000+"]
+
+# The only metadata fields /analytics reads
+ANALYTICS_COLUMNS = ['brand', 'categories', 'price', 'title']
+
+# Analytics sample size and ids per fetch call. Fetch goes over gRPC, so the only
+# cap is Pinecone's per-request id limit; ~4.6 MB of 1152-d values per 1000 ids
+# is far below the client's 128 MB message size.
+ANALYTICS_SAMPLE_SIZE = 1000
+ANALYTICS_FETCH_BATCH = 1000
+
+# The analytics payload rarely changes. A background task recomputes it a little
+# more often than the TTL, so requests are normally served straight from the cache.
+ANALYTICS_TTL = 600
+ANALYTICS_REFRESH_INTERVAL = 540
+analytics_cache = TTLCache(maxsize=1, ttl=ANALYTICS_TTL)
+analytics_lock = asyncio.Lock()
+
+def metadata_frame(metadatas) -> pd.DataFrame:
+    """Build the analytics DataFrame column by column from metadata dicts"""
+    columns = {name: [] for name in ANALYTICS_COLUMNS}
+    for metadata in metadatas:
+        metadata = metadata or {}
+        for name, values in columns.items():
+            values.append(metadata.get(name))
+    return pd.DataFrame(columns)
+
+def sample_metadata(total_vectors: int) -> list:
+    """Metadata for up to ANALYTICS_SAMPLE_SIZE products, without running an ANN search"""
+    limit = min(total_vectors, ANALYTICS_SAMPLE_SIZE)
+    try:
+        ids = []
+        for page in index.list(limit=min(limit, 100)):
+            ids.extend(page)
+            if len(ids) >= limit:
+                break
+        ids = ids[:limit]
     except Exception as e:
-        print(f"Error fetching analytics: {e}")
+        # list() is only available on serverless indexes
+        print(f"Index list unavailable, falling back to query: {e}")
+        response = index.query(
+            vector=ZERO_QUERY_VECTOR,
+            top_k=limit,
+            include_metadata=True
+        )
+        return [match['metadata'] for match in response['matches']]
+
+    metadatas = []
+    for i in range(0, len(ids), ANALYTICS_FETCH_BATCH):
+        response = index.fetch(ids=ids[i:i + ANALYTICS_FETCH_BATCH])
+        metadatas.extend(vector.metadata for vector in response.vectors.values())
+    return metadatas
+
+async def refresh_analytics(only_if_missing: bool = False) -> Optional[dict]:
+    """Recompute the analytics payload off the event loop and cache it"""
+    async with analytics_lock:
+        cached = analytics_cache.get("analytics")
+        if only_if_missing and cached is not None:
+            # Filled by another caller while this one waited for the lock
+            return cached
+        payload = await asyncio.to_thread(compute_analytics)
+        if payload is not None:
+            analytics_cache["analytics"] = payload
+        return payload
+
+async def refresh_analytics_forever():
+    while True:
+        try:
+            await refresh_analytics()
+        except Exception as e:
+            print(f"⚠️ Analytics refresh error: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_INTERVAL)
+
+@app.get("/analytics")
+async def get_analytics():
+    payload = analytics_cache.get("analytics")
+    if payload is None:
+        try:
+            payload = await refresh_analytics(only_if_missing=True)
+        except Exception as e:
+            print(f"Error fetching analytics: {e}")
+    
+    if payload is not None:
+        return {**payload, "classifier_cache": title_cache_info()}
     
     # Fallback response
     return {
@@ -799,9 +1500,105 @@ def get_analytics():
         "average_price": 0,
         "most_expensive": None,
         "least_expensive": None,
-        "category_metrics": []
+        "category_metrics": [],
+        "classifier_cache": title_cache_info()
     }
 
+def compute_analytics() -> Optional[dict]:
+    """Analytics payload for a metadata sample of the index, or None when it is empty"""
+    stats = index.describe_index_stats()
+    total_vectors = stats.get('total_vector_count', 0)
+    
+    if total_vectors > 0:
+        df = metadata_frame(sample_metadata(total_vectors))
+    else:
+        df = pd.DataFrame()
+
+    if not df.empty:
+        # Top brands
+        top_brands = df['brand'].value_counts().nlargest(10).reset_index()
+        top_brands.columns = ['name', 'count']
+        
+        # Top categories
+        # Stored as stringified Python lists, e.g. "['Home & Kitchen', \"Kids' Furniture\"]".
+        # Pull the quoted items out with one vectorized regex instead of literal_eval per row.
+        cat_strs = df['categories'].dropna().astype(str).str.strip()
+        category_counts = (
+            # Truncated lists like "['a', 'b'" are skipped, as literal_eval would reject them
+            cat_strs[cat_strs.str.startswith('[') & cat_strs.str.endswith(']')]
+            .str.findall(CATEGORY_ITEM_RE)
+            .explode()
+            .dropna()
+            .map(lambda groups: groups[0] or groups[1])
+            .value_counts()
+            .head(15)
+        )
+        top_categories = [
+            {"name": cat, "count": int(count)} 
+            for cat, count in category_counts.items()
+        ]
+        
+        # Price analytics - parse every price string in one vectorized pass
+        price_num = pd.to_numeric(
+            df['price'].astype(str)
+            .str.replace(r'[$,]', '', regex=True)
+            .str.extract(f"({PRICE_RE.pattern})", expand=False),
+            errors='coerce'
+        )
+        prices = price_num.dropna()
+        
+        # Price distribution (buckets)
+        price_distribution = []
+        if not prices.empty:
+            bucket_counts = pd.cut(
+                prices,
+                bins=PRICE_BUCKET_EDGES,
+                labels=PRICE_BUCKET_LABELS,
+                right=False
+            ).value_counts(sort=False)
+            price_distribution = [
+                {"range": range_label, "count": int(count)}
+                for range_label, count in bucket_counts.items()
+                if count > 0
+            ]
+        
+        # Average price
+        avg_price = float(prices.mean()) if not prices.empty else 0
+        
+        # Most/Least expensive products
+        most_expensive = None
+        least_expensive = None
+        if not prices.empty:
+            most_row = df.loc[prices.idxmax()]
+            least_row = df.loc[prices.idxmin()]
+            most_expensive = {
+                "title": most_row.get('title', 'Unknown'),
+                "price": most_row.get('price', 'N/A')
+            }
+            least_expensive = {
+                "title": least_row.get('title', 'Unknown'),
+                "price": least_row.get('price', 'N/A')
+            }
+        
+        # Category metrics for radar chart
+        category_metrics = [
+            {"category": cat["name"][:15], "count": cat["count"]} 
+            for cat in top_categories[:8]
+        ]
+        
+        return {
+            "total_products": total_vectors,
+            "top_brands": top_brands.to_dict('records'),
+            "top_categories": top_categories,
+            "price_distribution": price_distribution,
+            "average_price": round(avg_price, 2),
+            "most_expensive": most_expensive,
+            "least_expensive": least_expensive,
+            "category_metrics": category_metrics
+        }
+
+    return None
+
 SECRET_TOKEN = os.getenv("PING_SECRET")
 
 @app.get("/ping")
@@ -1,5 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
-import axios from 'axios';
+
+// Must match HISTORY_TURNS in backend/app/main.py (includes the new user message)
+const HISTORY_TURNS = 4;
 
 const ChatPage = () => {
     const [messages, setMessages] = useState([
@@ -43,56 +45,105 @@ const ChatPage = () => {
         const userMessage = { from: 'user', text: input };
         const currentMessagesForState = [...messages, userMessage];
 
-        // Prepare the history for the API, ensuring the backend gets the right format
-        const historyForAPI = messages.map(m => ({ from_user: m.from, text: m.text }));
+        // Prepare the history for the API, ensuring the backend gets the right format.
+        // The backend only reads the last HISTORY_TURNS messages, so don't send the rest.
+        const historyForAPI = messages
+            .slice(-(HISTORY_TURNS - 1))
+            .map(m => ({ from_user: m.from, text: m.text }));
 
         setMessages(currentMessagesForState);
         setInput('');
         setIsLoading(true);
 
+        // Set once a preview (or partial answer) bubble is on screen; whatever comes
+        // next - the final answer or an error - replaces it
+        let hasPreview = false;
+
         try {
             const API_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
-            const response = await axios.post(`${API_URL}/recommend`, {
-                query: input,
-                history: [...historyForAPI, { from_user: 'user', text: input }],
-                last_products: lastShownProducts.map(p => ({
-                    id: p.id,
-                    title: p.title,
-                    image: p.image,
-                    price: p.price,
-                    key_features: p.key_features,
-                    best_for: p.best_for,
-                    dimensions: p.dimensions,
-                    material: p.material,
-                    color: p.color,
-                    brand: p.brand
-                }))
+            const response = await fetch(`${API_URL}/recommend/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    query: input,
+                    history: [...historyForAPI, { from_user: 'user', text: input }],
+                    last_products: lastShownProducts.map(p => ({
+                        id: p.id,
+                        title: p.title,
+                        image: p.image,
+                        price: p.price,
+                        key_features: p.key_features,
+                        best_for: p.best_for,
+                        dimensions: p.dimensions,
+                        material: p.material,
+                        color: p.color,
+                        brand: p.brand
+                    }))
+                })
             });
 
-            const data = response.data;
-            
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw Object.assign(new Error(`HTTP ${response.status}`), {
+                    response: { status: response.status, data: body }
+                });
+            }
+
+            // The backend streams NDJSON: zero or more "preview" events (or "delta" chunks
+            // of an answer being written), then the final response
+            let data = null;
+            let streamedText = '';
+            const showPreview = (previewMessage) => {
+                const replacePrevious = hasPreview; // state updaters run later, so capture it now
+                setMessages(prev => replacePrevious ? [...prev.slice(0, -1), previewMessage] : [...prev, previewMessage]);
+                hasPreview = true;
+            };
+            const handleEvent = (event) => {
+                if (event.type === 'preview') {
+                    showPreview({ from: 'bot', text: event.response, products: event.recommendations, preview: true });
+                } else if (event.type === 'delta') {
+                    streamedText += event.text;
+                    showPreview({ from: 'bot', text: streamedText, preview: true });
+                } else {
+                    data = event;
+                }
+            };
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+                if (done) break;
+            }
+            if (buffer.trim()) handleEvent(JSON.parse(buffer));
+
             // Log the response for debugging
             console.log('Backend response:', data);
             
             let botMessage;
 
             // Handle greeting response
-            if (data.type === 'greeting') {
+            if (data?.type === 'greeting') {
                 botMessage = { from: 'bot', text: data.response };
                 setLastShownProducts([]); // Reset products on greeting
             } 
             // Handle answer/question response
-            else if (data.type === 'answer') {
+            else if (data?.type === 'answer') {
                 botMessage = { from: 'bot', text: data.response };
                 // Don't reset products for answers/questions
             } 
             // Handle no results found
-            else if (data.type === 'no_results') {
+            else if (data?.type === 'no_results') {
                 botMessage = { from: 'bot', text: data.response };
                 setLastShownProducts([]); // Clear products when no results
             }
             // Handle product recommendations
-            else if (data.type === 'products' && data.recommendations?.length > 0) {
+            else if (data?.type === 'products' && data.recommendations?.length > 0) {
                 // Use custom response message if provided, otherwise use default
                 const responseText = data.response || "Here are some recommendations based on your request:";
                 botMessage = { 
@@ -105,11 +156,13 @@ const ChatPage = () => {
             // Fallback for unexpected responses
             else {
                 console.error('Unexpected response format:', data);
-                botMessage = { from: 'bot', text: "I'm sorry, I couldn't find any products that match your search. Please try describing it differently." };
+                botMessage = { from: 'bot', text: data?.type === 'error' ? data.response : "I'm sorry, I couldn't find any products that match your search. Please try describing it differently." };
                 setLastShownProducts([]);
             }
             
-            setMessages(prev => [...prev, botMessage]);
+            // The final answer replaces the preview, if one was shown
+            const replacePreview = hasPreview;
+            setMessages(prev => replacePreview ? [...prev.slice(0, -1), botMessage] : [...prev, botMessage]);
 
         } catch (error) {
             console.error("Error fetching recommendations:", error);
@@ -120,7 +173,7 @@ const ChatPage = () => {
             if (error.response) {
                 // Server responded with error
                 errorText = `Server error: ${error.response.status}. ${error.response.data?.detail || 'Please try again.'}`;
-            } else if (error.request) {
+            } else if (error.request || error instanceof TypeError) {
                 // Request made but no response
                 errorText = 'No response from server. Please check if the backend is running.';
             } else {
@@ -129,7 +182,8 @@ const ChatPage = () => {
             }
             
             const errorMessage = { from: 'bot', text: errorText };
-            setMessages(prev => [...prev, errorMessage]);
+            const replacePreview = hasPreview;
+            setMessages(prev => replacePreview ? [...prev.slice(0, -1), errorMessage] : [...prev, errorMessage]);
         } finally {
             setIsLoading(false);
         }